@@ -82,6 +82,9 @@ def add_tracking(parser):
     # TODO: add tracking threshold in the options
     tg = parser.add_argument_group('Arguments specific to "videotracking" engine')
     tg.add_argument('--detect_period', type=int, default=1, dest='detect_period', help=htracking)
+    tg.add_argument('--tracking_backend', default='dlib', choices=['dlib', 'mosse', 'kcf'],
+                    help='''face tracking algorithm. dlib correlation tracker is the most robust.
+                    OpenCV's MOSSE and KCF trackers are faster, but do not adapt to face scale changes''')
 
 def add_batchsize(parser):
     parser.add_argument('--batch_size', default=32, type=int,
@@ -122,7 +125,7 @@ def engine_factory(args):
     if engine == 'video':
         return ifa.VideoAnalyzer(detector, classifier, bs)
     if engine == 'videotracking':
-        return ifa.VideoTracking(args.detect_period, detector, classifier, bs)
+        return ifa.VideoTracking(args.detect_period, detector, classifier, bs, tracking_backend=args.tracking_backend)
     if engine == 'videokeyframes':
         engine = ifa.VideoKeyframes(detector, classifier, bs)
     raise NotImplementedError()
\ No newline at end of file
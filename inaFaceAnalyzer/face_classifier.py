@@ -61,7 +61,6 @@ import numbers
 from abc import ABC, abstractmethod
 import tensorflow
 from tensorflow import keras
-from tensorflow.keras.preprocessing.image import img_to_array
 
 import inaFaceAnalyzer.keras_vggface_patch as keras_vggface
 from .svm_utils import svm_load
@@ -166,7 +165,8 @@ class FaceClassifier(ABC):
         images are supposed to be preprocessed faces: aligned, cropped
         Parameters
         ----------
-        limg : list of images, a single image can also be used
+        limg : list of images, or numpy array of stacked images
+            (batch, height, width, 3). A single image can also be used
 
         Returns
         -------
@@ -197,7 +197,7 @@ class FaceClassifier(ABC):
         
 
 
-        if isinstance(limg, list):
+        if isinstance(limg, list) or (isinstance(limg, np.ndarray) and limg.ndim == 4):
             islist = True
         else:
             islist = False
@@ -218,18 +218,69 @@ class FaceClassifier(ABC):
         ret = next(batch_ret_preds.itertuples(index=False, name='FaceClassifierResult'))
         return ret
 
+def _load_resnet50(fname, precision):
+    """
+    Load a serialized Resnet50 keras model
+
+    Args:
+        fname (str): remote model file name (see remote_utils.py)
+        precision (str): 'fp32' for default float32 inference, or 'fp16' for
+            mixed precision inference (float16 computations, float32 variables)
+
+    Returns:
+        keras.Model
+    """
+    m = keras.models.load_model(get_remote(fname), compile=False)
+    model = tensorflow.keras.Model(inputs=m.inputs, outputs=m.outputs)
+    if precision == 'fp32':
+        return model
+    if precision != 'fp16':
+        raise NotImplementedError(precision)
+
+    # rebuild the model with a mixed precision policy for each layer
+    config = model.get_config()
+    _set_mixed_precision(config, True)
+    ret = tensorflow.keras.Model.from_config(config)
+    ret.set_weights(model.get_weights())
+
+    if not any(getattr(l, 'compute_dtype', None) == 'float16' for l in ret.submodules):
+        raise Exception('mixed precision could not be applied to model %s' % fname)
+    return ret
+
+def _set_mixed_precision(config, keep_outputs):
+    """
+    Set a mixed precision policy to the layers of a functional model config.
+    Nested models are processed recursively. Input layers, and output layers
+    if keep_outputs is True, are kept in float32.
+    """
+    output_layers = [e[0] for e in config['output_layers']] if keep_outputs else []
+    for layer in config['layers']:
+        is_output = layer['config']['name'] in output_layers
+        if 'layers' in layer['config']:
+            _set_mixed_precision(layer['config'], is_output)
+        elif layer['class_name'] != 'InputLayer' and not is_output:
+            layer['config']['dtype'] = 'mixed_float16'
+
 class Resnet50FairFace(FaceClassifier):
     """
     Resnet50FairFace uses Resnet50 architecture trained to predict gender on
     `FairFace <https://github.com/joojs/fairface>`_.
     """
-    
-    def __init__(self):
-        m = keras.models.load_model(get_remote('keras_resnet50_fairface.h5'), compile=False)
-        self.model = tensorflow.keras.Model(inputs=m.inputs, outputs=m.outputs)
+
+    # remote model file name (see remote_utils.py)
+    _model_fname = 'keras_resnet50_fairface.h5'
+
+    def __init__(self, precision='fp32'):
+        """
+        Args:
+            precision (str, optional): 'fp32' or 'fp16'. 'fp16' uses mixed \
+                precision inference, which is faster on GPUs with tensor cores \
+                (and slower on CPU), with slightly different results. Defaults to 'fp32'.
+        """
+        self.model = _load_resnet50(self._model_fname, precision)
 
     def list2batch(self, limg):
-        x = np.concatenate([np.expand_dims(img_to_array(e), axis=0) for e in limg])
+        x = np.array(limg, dtype=keras.backend.floatx())
         return tensorflow.keras.applications.resnet50.preprocess_input(x)
 
     def inference(self, x):
@@ -271,9 +322,7 @@ class Resnet50FairFaceGRA(Resnet50FairFace):
     These models can however be provided for free after examination of each demand.
     """
 
-    def __init__(self):
-        m = keras.models.load_model(get_remote('keras_resnet50_fairface_GRA.h5'), compile=False)
-        self.model = tensorflow.keras.Model(inputs=m.inputs, outputs=m.outputs)
+    _model_fname = 'keras_resnet50_fairface_GRA.h5'
 
     def inference(self, x):
         gender, _, age = self.model.predict(x, verbose=0)
@@ -361,8 +410,8 @@ class OxfordVggFace(FaceClassifier):
         returns VGG16 Features
         limg is a list of preprocessed images supposed to be aligned and cropped and resized to 224*224
         """
-        limg = [np.expand_dims(img_to_array(e[:, :, ::-1]), axis=0) for e in limg]
-        x = keras_vggface.preprocess_input(np.concatenate(limg))
+        x = np.array(limg, dtype=keras.backend.floatx())[..., ::-1]
+        x = keras_vggface.preprocess_input(x)
         return self.vgg_feature_extractor(x)
 
     def inference(self, x):
@@ -117,14 +117,37 @@ class FaceDetector(ABC):
         Returns:
             list of :class:`Detection` instances
         """        
-        
-        tmpframe = frame
+        return self.batch([frame], verbose)[0]
 
-        if self.padd_prct:
-            tmpframe, yoffset, xoffset = _blackpadd(frame, self.padd_prct)
+    def batch(self, lframes, verbose=False):
+        """
+        Perform face detection on a list of image frames.
+        Face detection classes supporting batch processing (such as
+        :class:`OcvCnnFacedetector`) process all frames in a single inference
+        call, which is faster than processing frames one by one.
+
+        Args:
+            lframes (list of :class:`numpy.ndarray`): RGB image frames (height, width, 3).
+            verbose (bool, optional): display intermediate results such as detected faces Not to be used in production. Defaults to False.
+
+        Returns:
+            list containing a list of :class:`Detection` instances for each frame
+        """
+        ltmpframes = []
+        loffsets = []
+        for frame in lframes:
+            if self.padd_prct:
+                tmpframe, yoffset, xoffset = _blackpadd(frame, self.padd_prct)
+            else:
+                tmpframe, yoffset, xoffset = frame, 0, 0
+            ltmpframes.append(tmpframe)
+            loffsets.append((xoffset, yoffset))
+
+        llret = self._batch_call_imp(ltmpframes)
 
-        lret = self._call_imp(tmpframe)
+        return [self._filter_detections(frame, lret, xoffset, yoffset, verbose) for frame, lret, (xoffset, yoffset) in zip(lframes, llret, loffsets)]
 
+    def _filter_detections(self, frame, lret, xoffset, yoffset, verbose):
 
         # filter detected faces to return only faces with a dimension length
         # (absolute or relative)
@@ -156,6 +179,11 @@ class FaceDetector(ABC):
     @abstractmethod
     def _call_imp(self, frame): pass
 
+    def _batch_call_imp(self, lframes):
+        # default implementation : frames are processed one by one
+        # to be overriden by detection classes supporting batch processing
+        return [self._call_imp(frame) for frame in lframes]
+
     def most_central_face(self, frame, contain_center=True, verbose=False):
         """
         To be used for processing ML datasets and training new face classification models.
@@ -287,37 +315,49 @@ class OcvCnnFacedetector(FaceDetector):
                                 - the bounding box
                                 - face detection confidence score
         """
+        return self._batch_call_imp([frame])[0]
 
-        faces_data = []
-        h, w, z = frame.shape
+    def _batch_call_imp(self, lframes):
 
         # The CNN is intended to work images resized to 300*300
         # tests were carried on using different input size and were associated
         # to usatisfactory results
-        blob = cv2.dnn.blobFromImage(frame, 1.0, (300, 300), [104, 117, 123], True, False)
+        # All frames are processed in a single forward pass
+        blob = cv2.dnn.blobFromImages(lframes, 1.0, (300, 300), [104, 117, 123], True, False)
         self.model.setInput(blob)
         detections = self.model.forward()
 
-        assert(np.all(-np.sort(-detections[:,:,:,2]) == detections[:,:,:,2]))
-
-        for i in range(detections.shape[2]):
-            confidence = detections[0, 0, i, 2]
-
-            if confidence < self.minconf:
-                break
-
-            bbox = Rect(*detections[0, 0, i, 3:7])
-            # remove noisy detections coordinates
-            if bbox.x1 >= 1 or bbox.y1 >= 1 or bbox.x2 <= 0 or bbox.y2 <= 0:
-                continue
-            if bbox.x1 >= bbox.x2 or bbox.y1 >= bbox.y2:
-                continue
-
-            # Map relative coordinates 0...1 to absolute  frame width and height
-            bbox = bbox.mult(w, h)
-            faces_data.append(Detection(bbox, confidence))
-
-        return faces_data
+        # detections: [1, 1, N, 7] with columns
+        # (image index, label, confidence, x1, y1, x2, y2)
+        detections = detections[0, 0]
+
+        llret = []
+        for iframe, frame in enumerate(lframes):
+            h, w, z = frame.shape
+            fdetections = detections[detections[:, 0] == iframe]
+            # sort detections by decreasing confidence
+            fdetections = fdetections[np.argsort(-fdetections[:, 2], kind='stable')]
+
+            faces_data = []
+            for i in range(len(fdetections)):
+                confidence = fdetections[i, 2]
+
+                if confidence < self.minconf:
+                    break
+
+                bbox = Rect(*fdetections[i, 3:7])
+                # remove noisy detections coordinates
+                if bbox.x1 >= 1 or bbox.y1 >= 1 or bbox.x2 <= 0 or bbox.y2 <= 0:
+                    continue
+                if bbox.x1 >= bbox.x2 or bbox.y1 >= bbox.y2:
+                    continue
+
+                # Map relative coordinates 0...1 to absolute  frame width and height
+                bbox = bbox.mult(w, h)
+                faces_data.append(Detection(bbox, confidence))
+            llret.append(faces_data)
+
+        return llret
 
 
 class LibFaceDetection(FaceDetector):
@@ -79,7 +79,7 @@ def alignCrop(frame, bb, left_eye, right_eye, verbose=False):
 
 
 
-def preprocess_face(frame, detection, squarify, bbox_scale, face_alignment, output_shape, verbose=False):
+def preprocess_face(frame, detection, squarify, bbox_scale, face_alignment, output_shape, verbose=False, out=None, eyes=None):
     """
     Apply preprocessing pipeline to a detected face and returns the
     corresponding image with the following optional processings
@@ -106,6 +106,13 @@ def preprocess_face(frame, detection, squarify, bbox_scale, face_alignment, outp
         estimation of facial landmarks such the eyes lie on a horizontal line
     output_shape: (width, height) or None
         if not None, face will be resized to the provided output shape
+    out: numpy nd.array or None
+        if not None, the resulting face image is written in this preallocated
+        array, which is returned instead of a new image
+    eyes: ((x, y), (x, y)) or None
+        precomputed left and right eye centers. If not None, they are used
+        for face alignment instead of the facial landmarks estimated with
+        face_alignment. Ignored if face_alignment is None
     Returns
     -------
     frame: np.array RGB image data
@@ -124,7 +131,9 @@ def preprocess_face(frame, detection, squarify, bbox_scale, face_alignment, outp
         bbox = detection.bbox
 
     if face_alignment is not None:
-        left_eye, right_eye = face_alignment(frame, bbox)
+        if eyes is None:
+            eyes = face_alignment(frame, bbox)
+        left_eye, right_eye = eyes
 
     # if True, extend the bounding box to the smallest square containing
     # the orignal bounding box
@@ -148,7 +157,11 @@ def preprocess_face(frame, detection, squarify, bbox_scale, face_alignment, outp
 
     # resize image to the required output shape
     if output_shape is not None:
-        frame = cv2.resize(frame, output_shape)
+        frame = cv2.resize(frame, output_shape, dst=out)
+
+    if out is not None and frame is not out:
+        out[...] = frame
+        frame = out
 
     if verbose:
         print('resulting image')
@@ -24,8 +24,11 @@
 # THE SOFTWARE.
 
 from typing import NamedTuple
+from functools import partial
 import dlib
+import cv2
 import numpy as np
+from scipy.optimize import linear_sum_assignment
 from .rect import Rect
 from .opencv_utils import disp_frame_shapes
 
@@ -43,35 +46,79 @@ class TrackDetection(NamedTuple):
     #: tracking confidence
     track_conf : float
 
-def _matrix_argmax(m):
-    x = np.argmax(m)
-    dim = m.shape[1]
-    return x // dim, x % dim
+def _boxes_iou(A, B):
+    """
+    Pairwise intersection over union between two sets of bounding boxes
+
+    Args:
+        A (array-like): N bounding boxes (x1, y1, x2, y2), shape [N, 4]
+        B (array-like): M bounding boxes (x1, y1, x2, y2), shape [M, 4]
+
+    Returns:
+        numpy.ndarray: IOU matrix of shape [N, M]
+    """
+    A = np.asarray(A, dtype=np.float64).reshape(-1, 4)
+    B = np.asarray(B, dtype=np.float64).reshape(-1, 4)
+
+    # broadcasting [N, 1] against [1, M] columns
+    # results in [N, M] matrices without intermediate copies
+    a = A[:, np.newaxis, :]
+    b = B[np.newaxis, :, :]
+
+    inter_w = np.minimum(a[..., 2], b[..., 2]) - np.maximum(a[..., 0], b[..., 0])
+    inter_h = np.minimum(a[..., 3], b[..., 3]) - np.maximum(a[..., 1], b[..., 1])
+    inter = np.maximum(inter_w, 0) * np.maximum(inter_h, 0)
+
+    area1 = (A[:, 2] - A[:, 0]) * (A[:, 3] - A[:, 1])
+    area2 = (B[:, 2] - B[:, 0]) * (B[:, 3] - B[:, 1])
+    union = area1[:, np.newaxis] + area2[np.newaxis, :] - inter
+
+    return inter / union
+
+def _is_in_frame(bbox, fshape):
+    """
+    True if bounding box (x1, y1, x2, y2) intersects a frame of shape (height, width, ...)
+    """
+    x1, y1, x2, y2 = bbox
+    fh, fw = fshape[:2]
+    return (x2 > 0) and (x1 < fw) and (y2 > 0) and (y1 < fh)
 
 class Tracker:
+    """
+    Single object tracker based on dlib's correlation tracker.
+    dlib's python bindings do not expose correlation_tracker.update_noscale:
+    each update performs a multi-scale search. :class:`OpencvTracker` should
+    be used for faster tracking without scale estimation.
+    """
+
+    # confidence is estimated as the peak to side-lobe ration returned
+    # on tracker's update
+    min_confidence = 7
+
     def __init__(self, frame, bb, detect_conf):
         self.t = dlib.correlation_tracker()
         if not isinstance(bb, dlib.drectangle):
             bb = dlib.drectangle(*bb)
         self.t.start_track(frame, bb)
+        self._update_position()
         self.fshape = frame.shape
         self.detect_conf = detect_conf
         self.track_conf = None
 
+    def _update_position(self):
+        # tracker position is cached after each tracker modification, in order
+        # to avoid repeated calls to dlib
+        self.pos = Rect.from_dlib(self.t.get_position())
+
     def update(self, frame, verbose=False):
         update_val = self.t.update(frame)
-
-        fh, fw, _ = self.fshape
-
-        e = self.t.get_position()
-        x1, y1, x2, y2 = pos = Rect.from_dlib(e)
-
+        self._update_position()
 
         if verbose:
-            print('update', pos, update_val)
-            disp_frame_shapes(frame, [pos])
+            print('update', self.pos, update_val)
+            disp_frame_shapes(frame, [self.pos])
 
-        if not ((x2 > 0) and (x1 < fw) and (y2 > 0) and (y1 < fh)):
+        if not _is_in_frame(self.pos, self.fshape):
             update_val = -1
 
         self.detect_conf = None
@@ -79,27 +126,103 @@ class Tracker:
         return update_val
 
     def update_from_detection(self, frame, dtc, verbose=False):
-        update_val = self.t.update(frame, dtc.bbox.to_dlibFloat())
+        # dlib rectangles are only built at the boundary with dlib API
+        bb = dtc.bbox.to_dlibFloat()
+        update_val = self.t.update(frame, bb)
         if verbose:
             e = self.t.get_position()
             print('dest', dtc.bbox, 'new position', e)
             disp_frame_shapes(frame, [Rect.from_dlib(e), dtc.bbox])
-        self.t.start_track(frame, dtc.bbox.to_dlibFloat())
+        self.t.start_track(frame, bb)
+        self._update_position()
+        self.track_conf = update_val
+        self.detect_conf = dtc.detect_conf
+        return update_val
+
+
+class OpencvTracker:
+    """
+    Single object tracker based on OpenCV's KCF or MOSSE trackers.
+    These correlation filters are faster than dlib's correlation tracker
+    but do not adapt to scale changes
+    """
+
+    # OpenCV trackers do not provide a confidence value, and only tell if
+    # the tracked object was found (1) or lost (0)
+    min_confidence = 1
+
+    def __init__(self, frame, bb, detect_conf, backend='mosse'):
+        self.backend = backend
+        self._start_track(frame, bb)
+        self.fshape = frame.shape
+        self.detect_conf = detect_conf
+        self.track_conf = None
+
+    def _start_track(self, frame, bb):
+        x1, y1, x2, y2 = bb
+        box = (x1, y1, x2 - x1, y2 - y1)
+        if self.backend == 'mosse':
+            self.t = cv2.legacy.TrackerMOSSE_create()
+        elif self.backend == 'kcf':
+            # default KCF color-names features require RGB frames
+            # tracking is performed on grayscale intensity features instead
+            params = cv2.TrackerKCF_Params()
+            params.desc_pca = cv2.TRACKER_KCF_GRAY
+            params.compressed_size = 1
+            self.t = cv2.TrackerKCF_create(params)
+            # non legacy API requires integer boxes
+            box = tuple(int(round(e)) for e in box)
+        else:
+            raise NotImplementedError(self.backend)
+        self.t.init(frame, box)
+        self.pos = Rect(x1, y1, x2, y2)
+
+    def _track(self, frame):
+        ok, (x, y, w, h) = self.t.update(frame)
+        if ok:
+            self.pos = Rect(x, y, x + w, y + h)
+        return float(ok)
+
+    def update(self, frame, verbose=False):
+        update_val = self._track(frame)
+
+        if verbose:
+            print('update', self.pos, update_val)
+            disp_frame_shapes(frame, [self.pos])
+
+        if not _is_in_frame(self.pos, self.fshape):
+            update_val = -1
+
+        self.detect_conf = None
+        self.track_conf = update_val
+        return update_val
+
+    def update_from_detection(self, frame, dtc, verbose=False):
+        update_val = self._track(frame)
+        if verbose:
+            print('dest', dtc.bbox, 'new position', self.pos)
+            disp_frame_shapes(frame, [self.pos, dtc.bbox])
+        # OpenCV trackers cannot be reinitialized: a new instance is created
+        self._start_track(frame, dtc.bbox)
         self.track_conf = update_val
         self.detect_conf = dtc.detect_conf
         return update_val
 
 
 class TrackerDetector:
-    # confidence is estimated as the peak to side-lobe ration returned
-    # on tracker's update
-    min_confidence = 7
+
+    # minimal intersection over union between a tracker position and a
+    # detected bounding box required to consider they correspond to the same face
+    min_iou = 0.7
 
     # output labels
     output_type = TrackDetection
     #out_names = ['bb', 'face_id', 'face_detect_conf', 'tracking_conf']
 
-    def __init__(self, detector, detection_period):
+    # dimensions (width, height) of the frame thumbnails used to estimate motion
+    motion_thumbnail_shape = (64, 36)
+
+    def __init__(self, detector, detection_period, tracking_backend='dlib', motion_thresholds=None):
         # dictionnary of tracked objects
         self.d = {}
         # number of instantiated trackers
@@ -118,6 +241,33 @@ class TrackerDetector:
         # count the amount of processed frames
         # used to switch between detection and tracking every detection_period
         self.iframe = 0
+        # True if face detection was performed on the last processed frame
+        # False if faces were only tracked
+        self.detected = False
+        # tracking algorithm to be used: dlib's correlation tracker (default),
+        # or OpenCV's faster 'mosse' or 'kcf' trackers
+        # confidence threshold below which tracked elements are considered lost
+        # depends on the tracking backend
+        # OpenCV trackers use grayscale frames, which are 3 times smaller
+        # dlib's tracker uses RGB frames, its results depend on color channels
+        if tracking_backend == 'dlib':
+            self.tracker_factory = Tracker
+            self.min_confidence = Tracker.min_confidence
+            self.gray_tracking = False
+        elif tracking_backend in ['mosse', 'kcf']:
+            self.tracker_factory = partial(OpencvTracker, backend=tracking_backend)
+            self.min_confidence = OpencvTracker.min_confidence
+            self.gray_tracking = True
+        else:
+            raise NotImplementedError(tracking_backend)
+        # if not None, (low, high) thresholds on the mean absolute difference
+        # between grayscale thumbnails (0-255) of consecutive frames
+        # face detection is skipped if motion is below low threshold,
+        # and forced if motion is above high threshold (ie: shot change)
+        if motion_thresholds is not None:
+            assert len(motion_thresholds) == 2 and motion_thresholds[0] <= motion_thresholds[1], motion_thresholds
+        self.motion_thresholds = motion_thresholds
+        self.prev_thumbnail = None
 
 
     def update_trackers(self, frame, verbose = False):
@@ -135,60 +285,113 @@ class TrackerDetector:
         if verbose:
             print('update from detection')
 
+        # no face is currently tracked: each detected face starts a new tracker
+        if len(self.d) == 0:
+            self._add_trackers(frame, ldetections)
+            return
+
+        # no face detected: trackers that do not match any detection are removed
+        if len(ldetections) == 0:
+            self.d = {}
+            return
+
         lkeys = list(self.d.keys())
 
         # compute intersection over union matrix[#tracker, #detected bounding box]
         # between tracker positions and detected bounding boxes
-        ioumat = np.ones((len(lkeys), len(ldetections))) * -1
-        for i, k in enumerate(lkeys):
-            trackpos = Rect.from_dlib(self.d[k].t.get_position())
-            for j, detection in enumerate(ldetections):
-                ioumat[i, j] = detection.bbox.iou(trackpos)
-
-        # while matrix not empty and IOU > 70%
-        while np.prod(ioumat.shape):
-            # find the largest intersection over union
-            itracker, idetection = am = _matrix_argmax(ioumat)
-            if ioumat[am] <= 0.7:
-                break
-            # update closest bounding box and trackers and remove them from matrix
-            track_score = self.d[lkeys[itracker]].update_from_detection(frame, ldetections[idetection], verbose)
-            ioumat = np.delete(ioumat, itracker, axis = 0)
-            k = lkeys.pop(itracker)
-
-            # if close bounding box and tracker do not match, delete tracker
-            if track_score < self.min_confidence:
-                del self.d[k]
-            else:
-                # if bounding box and detected face match, remove
-                # the detection from the set
-                ldetections.pop(idetection)
-                ioumat = np.delete(ioumat, idetection, axis = 1)
-
+        trackpos = [self.d[k].pos for k in lkeys]
+        ioumat = _boxes_iou(trackpos, [e.bbox for e in ldetections])
+
+        # one-to-one assignment between trackers and detected bounding boxes
+        # maximizing the sum of IOU. Only pairs with IOU > min_iou are kept
+        ioumat[~(ioumat > self.min_iou)] = 0
+        litracker, lidetection = linear_sum_assignment(ioumat, maximize=True)
+
+        kept_trackers = set()
+        matched_detections = set()
+        for itracker, idetection in zip(litracker, lidetection):
+            if ioumat[itracker, idetection] <= self.min_iou:
+                continue
+            k = lkeys[itracker]
+            track_score = self.d[k].update_from_detection(frame, ldetections[idetection], verbose)
+            # if close bounding box and tracker do not match, the tracker
+            # will be deleted and the detection used to start a new tracker
+            if track_score >= self.min_confidence:
+                kept_trackers.add(k)
+                matched_detections.add(idetection)
 
         # remove trackers that do not match any detected box
         for k in lkeys:
-            del self.d[k]
+            if k not in kept_trackers:
+                del self.d[k]
 
         # add new trackers corresponding to detected faces that did not match
         # any existing tracker
+        self._add_trackers(frame, [dtc for i, dtc in enumerate(ldetections) if i not in matched_detections])
+
+    def _add_trackers(self, frame, ldetections):
         for dtc in ldetections:
-            self.d[self.nb_tracker] = Tracker(frame, dtc.bbox, dtc.detect_conf)
+            self.d[self.nb_tracker] = self.tracker_factory(frame, dtc.bbox, dtc.detect_conf)
             self.nb_tracker += 1
 
 
+    def _motion_based_detection(self, gray, detect, verbose=False):
+        """
+        Update the decision to perform face detection based on the amount
+        of motion between the current and the previous frames, estimated
+        on small grayscale thumbnails
+        """
+        thumbnail = cv2.resize(gray, self.motion_thumbnail_shape, interpolation=cv2.INTER_AREA).astype(np.float32)
+        prev_thumbnail = self.prev_thumbnail
+        self.prev_thumbnail = thumbnail
+
+        if prev_thumbnail is None:
+            return detect
+
+        motion = np.mean(np.abs(thumbnail - prev_thumbnail))
+        low, high = self.motion_thresholds
+        if verbose:
+            print('motion', motion)
+        if motion > high:
+            return True
+        if motion < low:
+            return False
+        return detect
+
+    def _tracker_frame(self, frame, gray):
+        """
+        Frame to be used by trackers: RGB frame with dlib's tracker, grayscale
+        frame with OpenCV trackers. gray is the grayscale conversion of frame
+        if already computed, else None
+        """
+        if not self.gray_tracking:
+            return frame
+        if gray is None:
+            gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
+        return gray
+
     def __call__(self, frame, verbose=False):
 
-        if self.iframe % self.detection_period == 0:
-            self.update_from_detection(frame, self.detector(frame, verbose), verbose)
-        else:
-            self.update_trackers(frame, verbose)
+        detect = self.iframe % self.detection_period == 0
+
+        gray = None
+        if self.motion_thresholds is not None:
+            gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
+            detect = self._motion_based_detection(gray, detect, verbose)
+
+        # face detection is performed on RGB frames
+        self.detected = detect
+        if detect:
+            ldetections = self.detector(frame, verbose)
+            self.update_from_detection(self._tracker_frame(frame, gray), ldetections, verbose)
+        elif len(self.d) > 0:
+            # between detections, trackers are updated only if faces were found
+            self.update_trackers(self._tracker_frame(frame, gray), verbose)
 
         lret = []
         for faceid in self.d:
             t = self.d[faceid]
-            bb = t.t.get_position()
-            lret.append(TrackDetection(Rect.from_dlib(bb), faceid, t.detect_conf, t.track_conf))
+            lret.append(TrackDetection(t.pos, faceid, t.detect_conf, t.track_conf))
 
         self.iframe += 1
 
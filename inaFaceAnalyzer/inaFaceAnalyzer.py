@@ -50,17 +50,93 @@ Custom face detection,  face classifier, eye detection and image preprocessing s
 """
 
 
+import queue
+import threading
+import multiprocessing
+from collections import deque
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+import numpy as np
 import pandas as pd
+import tensorflow
 from abc import ABC, abstractmethod
 from .opencv_utils import video_iterator, image_iterator, analysisFPS2subsamp_coeff, imwrite_rgb
 from .pyav_utils import video_keyframes_iterator
 from .face_tracking import TrackerDetector
-from .face_detector import LibFaceDetection, PrecomputedDetector
+from .face_detector import FaceDetector, LibFaceDetection, PrecomputedDetector
 from .face_classifier import Resnet50FairFaceGRA
 from .face_alignment import Dlib68FaceAlignment
 from .face_preprocessing import preprocess_face
 
 
+def _prefetch(iterator, maxsize):
+    """
+    Iterate over the elements of `iterator`, which are computed in a
+    background thread and stored in a queue of at most `maxsize` elements.
+    Allows to decode image/video frames while previous frames are processed.
+    Exceptions raised in the background thread are raised in the caller.
+    """
+    q = queue.Queue(maxsize)
+    stop = threading.Event()
+
+    def put(elt):
+        # do not block forever if the consumer stopped iterating
+        while not stop.is_set():
+            try:
+                q.put(elt, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def producer():
+        try:
+            for elt in iterator:
+                if not put((True, elt)):
+                    return
+            put((False, None))
+        except BaseException as e:
+            put((False, e))
+
+    threading.Thread(target=producer, daemon=True).start()
+
+    try:
+        while True:
+            has_elt, elt = q.get()
+            if not has_elt:
+                if elt is not None:
+                    raise elt
+                return
+            yield elt
+    finally:
+        stop.set()
+
+
+# models instantiated with default parameters are shared between analysis
+# engines, avoiding to reload them for each new engine: class -> instance
+_MODEL_CACHE = {}
+
+def _get_model(model_class):
+    if model_class not in _MODEL_CACHE:
+        _MODEL_CACHE[model_class] = model_class()
+    return _MODEL_CACHE[model_class]
+
+# analysis engine used in worker processes, see FaceAnalyzer.map
+# it is instantiated once per worker process and reused for each media
+_worker_engine = None
+
+def _init_worker(engine_class, engine_kwargs):
+    global _worker_engine
+    # tensorflow allocates most of GPU memory by default: GPU memory is
+    # allocated on demand, allowing several workers to share the same GPU
+    for gpu in tensorflow.config.list_physical_devices('GPU'):
+        tensorflow.config.experimental.set_memory_growth(gpu, True)
+    _worker_engine = engine_class(**engine_kwargs)
+
+def _worker_call(src, call_kwargs):
+    return _worker_engine(src, **call_kwargs)
+
+
 class FaceAnalyzer(ABC):
     """
     This is an abstract class containg the pipeline used to process
@@ -76,6 +152,23 @@ class FaceAnalyzer(ABC):
     # len of batches to be sent to face classifiers
     #batch_len = 32
 
+    # amount of decoded image frames waiting to be processed
+    prefetch_len = 4
+
+    # amount of image frames sent simultaneously to face detection classes
+    # supporting batch processing (not used with face tracking)
+    detection_batch_len = 8
+
+    # maximal amount of face batches submitted to the classification thread
+    # and not yet processed: bounds memory usage when classification is
+    # slower than decoding, detection and preprocessing
+    classification_queue_len = 2
+
+    # if True, eye positions of faces tracked between two detections are
+    # obtained from the last detection frame instead of facial landmarks
+    # (see VideoTracking)
+    reuse_tracked_eyes = False
+
     def __init__(self, face_detector = None, face_classifier = None, batch_len=32, verbose = False):
         """
         Construct a face processing pipeline composed of a face detector, 
@@ -85,12 +178,12 @@ class FaceAnalyzer(ABC):
         Args:
             face_detector (:class:`inaFaceAnalyzer.face_detector.FaceDetector` or None, optional): \
                 face detection object to be used. \
-                If None, create a new instance of :class:`inaFaceAnalyzer.face_detector.LibFaceDetection`. \
-                Defaults to None.
+                If None, use an instance of :class:`inaFaceAnalyzer.face_detector.LibFaceDetection` \
+                shared between analysis engines. Defaults to None.
             face_classifier (:class:`inaFaceAnalyzer.face_classifier.FaceClassifier` or None, optional): \
                 Face classification object to be used.\
-                if None, create a new instance of :class:`inaFaceAnalyzer.face_classifier.Resnet50FairFaceGRA`. \
-                    Defaults to None.
+                if None, use an instance of :class:`inaFaceAnalyzer.face_classifier.Resnet50FairFaceGRA` \
+                shared between analysis engines. Defaults to None.
             batch_len (int, optional): Size of batches to be sent to the GPU. \
                 Larger batches allow faster processing results but require more GPU memory. \
                 batch_len balue should be set according to the available hardware. \
@@ -103,12 +196,12 @@ class FaceAnalyzer(ABC):
 
         # face detection system
         if face_detector is None:
-            face_detector = LibFaceDetection()
+            face_detector = _get_model(LibFaceDetection)
         self.face_detector = face_detector
 
         # Face feature extractor from aligned and detected faces
         if face_classifier is None:
-            face_classifier = Resnet50FairFaceGRA()
+            face_classifier = _get_model(Resnet50FairFaceGRA)
         self.classifier = face_classifier
 
         # if set to True, then the bounding box (manual or automatic) is set
@@ -120,7 +213,7 @@ class FaceAnalyzer(ABC):
         self.bbox_scale = face_classifier.bbox_scale
 
         # face alignment module
-        self.face_alignment = Dlib68FaceAlignment()
+        self.face_alignment = _get_model(Dlib68FaceAlignment)
 
         # True if some verbose is required
         assert isinstance(verbose, bool)
@@ -152,6 +245,111 @@ class FaceAnalyzer(ABC):
         
         pass
 
+    @classmethod
+    def map(cls, lsrc, n_workers, engine_kwargs=None, **call_kwargs):
+        """
+        Analyze a list of media in parallel, using several processes.
+
+        Each worker process instantiates its own analysis engine
+        `cls(**engine_kwargs)` (detection, alignment and classification models)
+        once, and reuses it for all the media it is given.
+
+        >>> from inaFaceAnalyzer.inaFaceAnalyzer import VideoAnalyzer
+        >>> ldf = VideoAnalyzer.map([vid1, vid2, vid3], n_workers=3, fps=1)
+
+        Each worker loads its own models on all visible GPUs, and GPU memory
+        is allocated on demand. Workers sharing a GPU must fit in its memory.
+        On multi-GPU hosts, running one process per GPU with
+        `CUDA_VISIBLE_DEVICES` (see distributed workers) is recommended.
+
+        Args:
+            lsrc (list): list of media to be analyzed (for instance paths to video files)
+            n_workers (int): amount of worker processes
+            engine_kwargs (dict or None, optional): arguments to be used \
+                by each worker to instantiate the analysis engine. \
+                They should be picklable: face detectors and classifiers \
+                instances cannot be used. Defaults to None.
+            **call_kwargs: arguments passed to the engine's `__call__` method \
+                for each media (for instance: fps)
+
+        Returns:
+            list of :class:`pandas.DataFrame`, one for each media in lsrc
+        """
+        if engine_kwargs is None:
+            engine_kwargs = {}
+        # spawned processes are safer than forked processes with tensorflow
+        ctx = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(n_workers, mp_context=ctx, initializer=_init_worker, initargs=(cls, engine_kwargs)) as executor:
+            lfutures = [executor.submit(_worker_call, src, call_kwargs) for src in lsrc]
+            return [f.result() for f in lfutures]
+
+    def _detect_stream(self, stream_iterator, detector):
+        """
+        Iterate on image frames together with the faces detected in these frames
+
+        Face detection classes (:class:`inaFaceAnalyzer.face_detector.FaceDetector`)
+        process frames in batches of `detection_batch_len`. Other detectors,
+        such as face trackers, are called sequentially on each frame.
+
+        Yields
+        ------
+        (image identifier, RGB image frame, list of detections)
+        """
+        if not isinstance(detector, FaceDetector):
+            for iframe, frame in stream_iterator:
+                yield iframe, frame, detector(frame, self.verbose)
+            return
+
+        stream_iterator = iter(stream_iterator)
+        while True:
+            lbuf = list(islice(stream_iterator, self.detection_batch_len))
+            if len(lbuf) == 0:
+                return
+            llret = detector.batch([frame for _, frame in lbuf], self.verbose)
+            for (iframe, frame), lret in zip(lbuf, llret):
+                yield iframe, frame, lret
+
+    def _tracked_face_eyes(self, frame, detection, detected, deyes, ndeyes):
+        """
+        Eye centers used for aligning tracked faces
+
+        Facial landmarks are estimated on frames where faces are detected.
+        On frames where faces are only tracked, eye positions are obtained by
+        applying the bounding box displacement to the eye positions estimated
+        on the last detection frame of the same face.
+
+        Parameters
+        ----------
+        frame : numpy nd.array
+            RGB image data
+        detection : TrackDetection
+        detected : bool
+            True if face detection was performed on the current frame
+        deyes : dict
+            face_id -> (bbox, left_eye, right_eye) for the previous frame
+        ndeyes : dict
+            face_id -> (bbox, left_eye, right_eye) to be updated for the current frame
+
+        Returns
+        -------
+        left_eye, right_eye
+        """
+        fid = detection.face_id
+        bbox = detection.bbox
+
+        if not detected and fid in deyes:
+            obbox, oleft_eye, oright_eye = deyes[fid]
+            xscale = bbox.w / obbox.w
+            yscale = bbox.h / obbox.h
+            left_eye, right_eye = [(bbox.x1 + (x - obbox.x1) * xscale, bbox.y1 + (y - obbox.y1) * yscale) for x, y in [oleft_eye, oright_eye]]
+            # eye positions are kept relative to the last detected bounding box
+            ndeyes[fid] = deyes[fid]
+        else:
+            left_eye, right_eye = self.face_alignment(frame, bbox)
+            ndeyes[fid] = (bbox, left_eye, right_eye)
+
+        return left_eye, right_eye
+
     def _process_stream(self, stream_iterator, detector):
         """
         Generic pipeline allowing to process image or video streams
@@ -175,44 +373,76 @@ class FaceAnalyzer(ABC):
         """
         oshape = self.classifier.input_shape[:-1]
 
-        lbatch_img = []
+        # preprocessed faces are directly written in preallocated batches
+        # of shape (batch_len, height, width, 3)
+        new_batch = lambda: np.empty((self.batch_len, *self.classifier.input_shape), dtype=np.uint8)
+        batch = new_batch()
+        nfaces = 0
         linfo = []
         ldf = []
+        pending = deque()
+
+        # eye positions of tracked faces: face_id -> (bbox, left_eye, right_eye)
+        deyes = {}
+
+        # face classification is performed in a separate thread, allowing
+        # to perform face detection and preprocessing during batch inference
+        with ThreadPoolExecutor(max_workers=1) as executor:
 
-        # iterate on image list or video stream
-        for iframe, frame in stream_iterator:
+            def submit(faces):
+                # wait for the oldest batches before submitting a new one
+                while len(pending) >= self.classification_queue_len:
+                    ldf.append(pending.popleft().result())
+                pending.append(executor.submit(self.classifier, faces, self.verbose))
 
-            # iterate on detected faces
-            for detection in detector(frame, self.verbose):
+            # iterate on image list or video stream
+            # frames are decoded in a background thread
+            stream = _prefetch(stream_iterator, self.prefetch_len)
+            for iframe, frame, ldetections in self._detect_stream(stream, detector):
 
-                # preprocess detected faces: bbox normalization, eye detection, rotation, ...
-                face_img, bbox = preprocess_face(frame, detection, self.bbox2square, self.bbox_scale, self.face_alignment, oshape, False)
+                ndeyes = {}
 
-                linfo.append([iframe, detection._replace(bbox=tuple(bbox))])
-                # store preprocessed faces in a list, for further batch processing
-                lbatch_img.append(face_img)
+                # iterate on detected faces
+                for detection in ldetections:
 
-            # if enough faces were found, process a batch of faces
-            while len(lbatch_img) > self.batch_len:
-                df = self.classifier(lbatch_img[:self.batch_len], verbose=self.verbose)
-                ldf.append(df)
-                lbatch_img = lbatch_img[self.batch_len:]
+                    # facial landmarks may not be estimated for tracked faces
+                    # between two detections
+                    eyes = None
+                    if self.reuse_tracked_eyes and self.face_alignment is not None and isinstance(detector, TrackerDetector):
+                        eyes = self._tracked_face_eyes(frame, detection, detector.detected, deyes, ndeyes)
 
+                    # preprocess detected faces: bbox normalization, eye detection, rotation, ...
+                    _, bbox = preprocess_face(frame, detection, self.bbox2square, self.bbox_scale, self.face_alignment, oshape, False, out=batch[nfaces], eyes=eyes)
 
-        if len(lbatch_img) > 0:
-            df = self.classifier(lbatch_img, verbose=self.verbose)
-            ldf.append(df)
+                    linfo.append((iframe,) + detection._replace(bbox=tuple(bbox)))
+                    nfaces += 1
+
+                    # if enough faces were found, process a batch of faces
+                    # a new batch is allocated since the previous one is
+                    # being processed in the classification thread
+                    if nfaces == self.batch_len:
+                        submit(batch)
+                        batch = new_batch()
+                        nfaces = 0
+
+                # eye positions of faces that are no more tracked are discarded
+                deyes = ndeyes
+
+            if nfaces > 0:
+                submit(batch[:nfaces])
+
+            ldf += [f.result() for f in pending]
 
         if len(ldf) == 0:
             return pd.DataFrame(None, columns=(['frame'] + list(detector.output_type._fields) + self.classifier.output_cols))
 
         # return results as a pandas Dataframe
-        df1 = pd.DataFrame({'frame' : [e[0] for e in linfo]})
-        df2 = pd.DataFrame.from_records([e[1] for e in linfo], columns=detector.output_type._fields)
-        if 'eyes' in df2.columns:
-            df2 = df2.drop('eyes', axis=1)
-        df3 = pd.concat(ldf).reset_index(drop=True)
-        return pd.concat([df1, df2, df3], axis = 1)
+        # frame and detection information are stored in a single record per face
+        df1 = pd.DataFrame.from_records(linfo, columns=['frame'] + list(detector.output_type._fields))
+        if 'eyes' in df1.columns:
+            df1 = df1.drop('eyes', axis=1)
+        df2 = pd.concat(ldf, ignore_index=True)
+        return pd.concat([df1, df2], axis = 1)
 
 
 class ImageAnalyzer(FaceAnalyzer):
@@ -250,6 +480,30 @@ class ImageAnalyzer(FaceAnalyzer):
             stream = image_iterator(img_paths, verbose = self.verbose)
         return self._process_stream(stream, self.face_detector)
 
+    @classmethod
+    def map_images(cls, img_paths, n_workers, engine_kwargs=None, chunk_len=64):
+        """
+        Analyze a list of images in parallel, using several processes.
+        Images are split into chunks of `chunk_len` images processed by
+        worker processes, and results are merged in a single DataFrame.
+        See :meth:`FaceAnalyzer.map`, including GPU memory usage limitations.
+
+        Args:
+            img_paths (list): list of paths to image files to analyze
+            n_workers (int): amount of worker processes
+            engine_kwargs (dict or None, optional): picklable arguments used \
+                to instantiate the analysis engine in each worker. Defaults to None.
+            chunk_len (int, optional): amount of images sent to a worker at once. \
+                Defaults to 64.
+
+        Returns:
+            :class:`pandas.DataFrame` with the same format as :meth:`__call__` results
+        """
+        assert len(img_paths) > 0
+        lchunks = [img_paths[i:(i + chunk_len)] for i in range(0, len(img_paths), chunk_len)]
+        ldf = cls.map(lchunks, n_workers, engine_kwargs)
+        return pd.concat(ldf).reset_index(drop=True)
+
 
 class VideoAnalyzer(FaceAnalyzer):
     """
@@ -333,7 +587,7 @@ class VideoTracking(FaceAnalyzer):
     Classification decision functions and predictions are averaged for each
     tracked faces, allowing to obtain more robust analysis estimates
     """
-    def __init__(self, detection_period, face_detector = None, face_classifier = None, batch_len=32, verbose = False):
+    def __init__(self, detection_period, face_detector = None, face_classifier = None, batch_len=32, verbose = False, tracking_backend='dlib', motion_thresholds=None, reuse_tracked_eyes=False):
         """
         Constructor
 
@@ -354,9 +608,31 @@ class VideoTracking(FaceAnalyzer):
         verbose : boolean, optional
             If True, will display several usefull intermediate images and results.
             The default is False.
+        tracking_backend : str, optional
+            face tracking algorithm to be used: 'dlib' correlation tracker, or
+            OpenCV's 'mosse' and 'kcf' trackers which are faster, but do not
+            adapt to face scale changes. The default is 'dlib'.
+        motion_thresholds : (float, float) or None, optional
+            (low, high) thresholds on the mean absolute difference between
+            small grayscale thumbnails (pixel values 0-255) of consecutive
+            analyzed frames. If motion is below low threshold, face detection
+            is skipped and faces are only tracked. If motion is above high
+            threshold (ie: shot changes), face detection is performed.
+            Otherwise, detection is performed every detection_period frames.
+            If None, motion is not considered. The default is None.
+        reuse_tracked_eyes : boolean, optional
+            If True, facial landmarks used for face alignment are only
+            estimated on frames where face detection is performed. On frames
+            with tracking only, eye positions are obtained by applying the
+            tracked bounding box displacement and scaling to the eyes found on
+            the last detection frame. This is faster, but results differ
+            slightly from landmark estimation on every frame. The default is False.
         """
         super().__init__(face_detector, face_classifier, batch_len=batch_len, verbose=verbose)
+        self.reuse_tracked_eyes = reuse_tracked_eyes
         self.detection_period = detection_period
+        self.tracking_backend = tracking_backend
+        self.motion_thresholds = motion_thresholds
 
     def __call__(self, video_path, fps = None,  offset = 0):
         """
@@ -380,7 +656,7 @@ class VideoTracking(FaceAnalyzer):
             with same faceid. Smoothed estimates are usually more robust than
             instantaneous ones
         """
-        detector = TrackerDetector(self.face_detector, self.detection_period)
+        detector = TrackerDetector(self.face_detector, self.detection_period, self.tracking_backend, self.motion_thresholds)
 
         subsamp_coeff = 1 if fps is None else analysisFPS2subsamp_coeff(video_path, fps)
         stream = video_iterator(video_path, subsamp_coeff=subsamp_coeff, time_unit='ms', start=max(offset, 0), verbose=self.verbose)
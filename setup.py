@@ -75,7 +75,7 @@ setup(
     test_suite="test_inaFaceAnalyzer.py",
     description = DESCRIPTION,
     license = "MIT",
-    install_requires=['opencv-contrib-python', 'dlib', 'pandas', 'scikit-learn',
+    install_requires=['opencv-contrib-python', 'dlib', 'pandas', 'scipy', 'scikit-learn',
                       'h5py', 'matplotlib', 'onnxruntime-gpu', 'cheetah3',
                       'av', 'tensorflow>=2.6,<2.16.0', 'pyro4', 'xlsxwriter'],
     extras_require={'doc': ['sphinx-toolbox']},    
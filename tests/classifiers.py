@@ -102,6 +102,14 @@ class TestClassifiers(unittest.TestCase):
         np.testing.assert_almost_equal(ref_genderD, df.sex_decfunc, decimal=5)
         np.testing.assert_almost_equal(ref_ageD, df.age_decfunc, decimal=5)
 
+    def test_preprocessed_img_list_multioutput_fp16(self):
+        c = Resnet50FairFaceGRA(precision='fp16')
+        self.assertTrue(any(getattr(l, 'compute_dtype', None) == 'float16' for l in c.model.submodules))
+        df = c.preprocessed_img_list(['./media/diallo224.jpg', './media/knuth224.jpg'])
+        self.assertSequenceEqual(['f', 'm'], list(df.sex_label))
+        np.testing.assert_almost_equal([-5.632368, 7.2553654], df.sex_decfunc, decimal=1)
+        np.testing.assert_almost_equal([3.0723362, 6.6890726], df.age_decfunc, decimal=1)
+
     def test_batch_order(self):
         # test if image position in batch has an impact on decision value
         limg = [imread_rgb('./media/diallo224.jpg'), imread_rgb('./media/knuth224.jpg')] * 32
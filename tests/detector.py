@@ -56,6 +56,20 @@ class TestDetector(unittest.TestCase):
         ret = detector.get_closest_face(frame, (700, 0, 800, 200), min_iou=.1)
         self.assertIsNone(ret)
 
+    def test_opencv_cnn_detection_batch(self):
+        detector = OcvCnnFacedetector()
+        lframes = [imread_rgb('./media/800px-India_(236650352).jpg'),
+                   imread_rgb('./media/Europa21_-_2.jpg'),
+                   imread_rgb('./media/dknuth.jpg')]
+        lpred = detector.batch(lframes)
+        self.assertEqual(len(lpred), len(lframes))
+        for frame, pred in zip(lframes, lpred):
+            ref = detector(frame)
+            self.assertEqual(len(ref), len(pred))
+            for rdtc, dtc in zip(ref, pred):
+                self.assertAlmostEqual(rdtc.detect_conf, dtc.detect_conf, places=3)
+                assert_almost_equal(list(rdtc.bbox), list(dtc.bbox), decimal=1)
+
     def test_libfacedetection(self):
         detector = LibFaceDetection()
         frame = imread_rgb('./media/800px-India_(236650352).jpg')
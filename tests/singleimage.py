@@ -83,3 +83,11 @@ class TestImageAnalyzer(unittest.TestCase):
         # used to be associated with GPU memory issues on some architectures
         ia = ImageAnalyzer(face_detector=LibFaceDetection())
         ia(glob.glob('./media/*.jpg'))
+
+    def test_imagelist_map_images(self):
+        limg = sorted(glob.glob('./media/*.jpg'))
+        ref = ImageAnalyzer()(limg)
+        ret = ImageAnalyzer.map_images(limg, n_workers=2, chunk_len=2)
+        self.assertEqual(list(ref.frame), list(ret.frame))
+        self.assertEqual(list(ref.bbox), list(ret.bbox))
+        self.assertEqual(list(ref.sex_label), list(ret.sex_label))
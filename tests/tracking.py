@@ -32,8 +32,9 @@ import numpy as np
 from inaFaceAnalyzer.inaFaceAnalyzer import VideoTracking, VideoAnalyzer
 from inaFaceAnalyzer.face_classifier import Resnet50FairFaceGRA, Vggface_LSVM_YTF, Resnet50FairFace
 from inaFaceAnalyzer.face_detector import OcvCnnFacedetector, LibFaceDetection
-from inaFaceAnalyzer.face_tracking import Tracker
-from inaFaceAnalyzer.opencv_utils import imread_rgb
+from inaFaceAnalyzer.face_tracking import Tracker, OpencvTracker, TrackerDetector, _boxes_iou
+import cv2
+from inaFaceAnalyzer.opencv_utils import imread_rgb, video_iterator
 from inaFaceAnalyzer.rect import Rect
 
 _vid = './media/pexels-artem-podrez-5725953.mp4'
@@ -50,6 +51,63 @@ class TestTracking(unittest.TestCase):
         trackbb = Rect.from_dlib(t.t.get_position())
         np.testing.assert_almost_equal(bb, trackbb)
 
+    def test_boxes_iou(self):
+        lA = [Rect(0, 0, 10, 10), Rect(5, 5, 15, 20)]
+        lB = [Rect(0, 0, 10, 10), Rect(20, 20, 30, 30), Rect(2, 3, 12, 8)]
+        ioumat = _boxes_iou(lA, lB)
+        self.assertEqual(ioumat.shape, (2, 3))
+        for i, a in enumerate(lA):
+            for j, b in enumerate(lB):
+                self.assertAlmostEqual(ioumat[i, j], a.iou(b))
+
+    def test_opencv_tracker_gray(self):
+        frame = imread_rgb('./media/800px-India_(236650352).jpg')
+        gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
+        for backend in ['mosse', 'kcf']:
+            t = OpencvTracker(gray, Rect(100, 100, 200, 200), None, backend)
+            for _ in range(3):
+                self.assertEqual(t.update(gray), 1, backend)
+
+    def test_tracker_frame(self):
+        frame = imread_rgb('./media/800px-India_(236650352).jpg')
+        # dlib's tracker uses RGB frames, OpenCV trackers use grayscale frames
+        for backend, ndim in [('dlib', 3), ('mosse', 2), ('kcf', 2)]:
+            td = TrackerDetector(None, 5, backend)
+            self.assertEqual(td._tracker_frame(frame, None).ndim, ndim, backend)
+
+    def _count_detections(self, lframes, detection_period, motion_thresholds):
+        ldetect = []
+        def detector(frame, verbose):
+            ldetect.append(True)
+            return []
+        td = TrackerDetector(detector, detection_period, motion_thresholds=motion_thresholds)
+        for frame in lframes:
+            td(frame)
+        return len(ldetect)
+
+    def test_motion_static(self):
+        frame = np.full((72, 128, 3), 100, dtype=np.uint8)
+        lframes = [frame] * 12
+        # periodic detections are skipped for static frames
+        self.assertEqual(self._count_detections(lframes, 5, (1, 50)), 1)
+        # periodic detections are performed if motion is not considered
+        self.assertEqual(self._count_detections(lframes, 5, None), 3)
+
+    def test_motion_cut(self):
+        lframes = [np.full((72, 128, 3), 100, dtype=np.uint8)] * 3
+        lframes += [np.full((72, 128, 3), 200, dtype=np.uint8)] * 3
+        # shot change on frame 3 forces detection
+        self.assertEqual(self._count_detections(lframes, 5, (1, 50)), 2)
+        self.assertEqual(self._count_detections(lframes, 5, None), 2)
+        self.assertEqual(self._count_detections(lframes, 10, (1, 50)), 2)
+        self.assertEqual(self._count_detections(lframes, 10, None), 1)
+
+    def test_motion_thresholds_check(self):
+        with self.assertRaises(AssertionError):
+            TrackerDetector(None, 5, motion_thresholds=(50, 1))
+        with self.assertRaises(AssertionError):
+            TrackerDetector(None, 5, motion_thresholds=(1, 2, 3))
+
     # dlib's tracking is OS and/or architecture dependent
     @unittest.expectedFailure
     def test_tracker_updatebb(self):
@@ -90,6 +148,36 @@ class TestTracking(unittest.TestCase):
         self.assertEqual(len(df.columns), 13)
 
 
+    # eye positions moved with tracked faces should remain close to
+    # the positions estimated with facial landmarks
+    def test_tracked_eyes(self):
+        gt = VideoTracking(5, reuse_tracked_eyes=True)
+        detector = TrackerDetector(gt.face_detector, 5)
+        deyes = {}
+        ntracked = 0
+        for iframe, frame in video_iterator(_vid, stop=40):
+            ndeyes = {}
+            for detection in detector(frame):
+                eyes = gt._tracked_face_eyes(frame, detection, detector.detected, deyes, ndeyes)
+                if not detector.detected:
+                    ntracked += 1
+                    ref = gt.face_alignment(frame, detection.bbox)
+                    # tolerance: 10% of the face width
+                    np.testing.assert_allclose(eyes, ref, atol=.1 * detection.bbox.w)
+            deyes = ndeyes
+        self.assertGreater(ntracked, 0)
+
+    # eye positions reuse only impacts face alignment
+    def test_tracking_reuse_tracked_eyes(self):
+        detector = LibFaceDetection()
+        classif = Resnet50FairFaceGRA()
+        ref = VideoTracking(5, face_detector=detector, face_classifier=classif)(_vid, fps=3)
+        ret = VideoTracking(5, face_detector=detector, face_classifier=classif, reuse_tracked_eyes=True)(_vid, fps=3)
+        self.assertEqual(len(ref), len(ret))
+        self.assertEqual(list(ref.columns), list(ret.columns))
+        for col in ['frame', 'bbox', 'face_id', 'detect_conf', 'track_conf']:
+            assert_series_equal(ref[col], ret[col])
+
     # compare with and without tracking using non smooth columns only
     def test_trackingVSvideo(self):
         for c in [Vggface_LSVM_YTF, Resnet50FairFace, Resnet50FairFaceGRA]:
@@ -28,7 +28,7 @@ import pandas as pd
 from pandas.testing import assert_frame_equal, assert_series_equal
 import numpy as np
 import tensorflow as tf
-from inaFaceAnalyzer.inaFaceAnalyzer import VideoAnalyzer, VideoPrecomputedDetection, VideoKeyframes
+from inaFaceAnalyzer.inaFaceAnalyzer import VideoAnalyzer, VideoPrecomputedDetection, VideoKeyframes, _prefetch
 from inaFaceAnalyzer.face_classifier import Resnet50FairFace, Resnet50FairFaceGRA, Vggface_LSVM_YTF
 from inaFaceAnalyzer.face_detector import LibFaceDetection, PrecomputedDetector, OcvCnnFacedetector
 
@@ -160,3 +160,13 @@ class TestVideo(unittest.TestCase):
         df = gv(_vid, fps=1)
         self.assertEqual(len(df), 0)
         self.assertEqual(len(df.columns), 7, df.columns)
+
+    def test_prefetch(self):
+        self.assertEqual(list(_prefetch(iter(range(100)), 4)), list(range(100)))
+
+    def test_prefetch_exception(self):
+        def gen():
+            yield 1
+            raise ValueError('decoding error')
+        with self.assertRaises(ValueError):
+            list(_prefetch(gen(), 4))